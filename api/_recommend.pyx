@@ -0,0 +1,47 @@
+# cython: boundscheck=False, wraparound=False, cdivision=True, language_level=3
+"""
+Compiled rule-selection kernel for the recommendation API server.
+
+Same contract as the Numba/NumPy paths in server.py: for every candidate rule,
+check the confidence/lift thresholds and that none of its consequents is in
+the input bitset. The loop runs without the GIL and across threads (OpenMP).
+
+Build with: python setup.py build_ext --inplace
+"""
+
+import numpy as np
+from cython.parallel import prange
+from libc.stdint cimport int32_t, uint8_t, uint64_t
+
+
+cdef inline bint avoids_input(const int32_t[::1] offsets, const int32_t[::1] flat,
+                              const uint64_t[::1] input_bitset, int32_t rule) noexcept nogil:
+    cdef int32_t j, song
+    for j in range(offsets[rule], offsets[rule + 1]):
+        song = flat[j]
+        if (input_bitset[song >> 6] >> (song & 63)) & 1:
+            return False
+    return True
+
+
+def select_rules(const int32_t[::1] cand, const float[::1] conf, const float[::1] lift,
+                 const int32_t[::1] offsets, const int32_t[::1] flat,
+                 const uint64_t[::1] input_bitset, double min_confidence, double min_lift):
+    """
+    Test which candidate rules pass the thresholds and avoid the input songs.
+    conf/lift are the float32 rule metrics.
+    
+    Returns:
+        ndarray: Boolean array, True for the candidates to keep
+    """
+    cdef Py_ssize_t i, n = cand.shape[0]
+    cdef int32_t rule
+    keep_arr = np.zeros(n, dtype=np.bool_)
+    cdef uint8_t[::1] keep = keep_arr.view(np.uint8)
+    
+    for i in prange(n, nogil=True):
+        rule = cand[i]
+        if conf[rule] >= min_confidence and lift[rule] >= min_lift:
+            keep[i] = avoids_input(offsets, flat, input_bitset, rule)
+    
+    return keep_arr
@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration for the recommendation API server.
+
+Usage:
+    gunicorn -c gunicorn.conf.py server:app
+
+preload_app loads the model once in the master process before forking, so
+the workers share the rule arrays copy-on-write instead of each loading
+(and holding) its own copy. Threaded workers keep client connections
+alive between requests. Equivalent command line:
+    gunicorn --preload -w N --worker-class gthread --threads 4 --keep-alive 30 \
+        -b 0.0.0.0:$API_PORT server:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('API_PORT', '50013')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+keepalive = 30
+preload_app = True
@@ -7,29 +7,101 @@ Input songs should be provided as normalized track names, not Spotify URIs.
 """
 
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
+import orjson
 import pickle
+import pyarrow.feather as feather
 import os
 from datetime import datetime
 from pathlib import Path
 import sys
+import threading
 import unicodedata
 import string
+from itertools import chain
+from functools import lru_cache
+import numpy as np
+
+# Compiled kernels are optional: the per-rule scan uses the Cython extension
+# (built with setup.py) if present, else Numba, else plain NumPy
+try:
+    from _recommend import select_rules as _select_rules_ext
+    HAS_RECOMMEND_EXT = True
+except (ImportError, ValueError):  # ValueError: built against another numpy ABI
+    HAS_RECOMMEND_EXT = False
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# Numba's default (workqueue) threading layer must not be entered from several
+# threads at once, which gunicorn's threaded workers would otherwise do
+_numba_lock = threading.Lock()
 
 # Add parent directory to path to import RulesGenerator
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson, used by request.get_json and jsonify.
+    Serializes NumPy values natively and writes response bodies as bytes.
+    """
+    
+    option = orjson.OPT_SERIALIZE_NUMPY
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=self.option),
+            mimetype='application/json'
+        )
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Configuration
-MODEL_PATH = os.environ.get('MODEL_PATH', '/home/giovanamachado/TP2/rules_ds1.pkl')
+MODEL_PATH = os.environ.get('MODEL_PATH', '/home/giovanamachado/TP2/rules_ds1.feather')
 VERSION = os.environ.get('API_VERSION', '1.0.0')
 PORT = int(os.environ.get('API_PORT', '50013'))
 
 # Global variables to store model and metadata
 app.model_data = None
 app.model_date = None
+# Serialized constant part of /api/recommend responses (everything but "songs")
+app.response_prefix = None
+
+# Precomputed rule lookup structures (built once in load_model).
+# Everything indexed per rule lives in flat NumPy arrays, so under
+# `gunicorn --preload` the forked workers share these pages copy-on-write
+# instead of each touching (and thus copying) millions of Python objects.
+app.song2id = None
+app.id2song = None
+app.index_off = None    # CSR inverted index: song id -> rules with it as antecedent
+app.index_rules = None
+app.confidence = None   # float32 rule metrics
+app.lift = None
+app.score_q = None      # uint16-quantized confidence * lift
+app.avg_confidence = None
+app.avg_lift = None
+app.cons_off = None     # CSR consequents: rule -> song ids
+app.cons_flat = None
 
+# Punctuation removal table, built once instead of on every normalization
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation)
 
+
+@lru_cache(maxsize=50000)
 def normalize_track_name(track_name):
     """
     Normalize track name to match the format used in the model.
@@ -41,40 +113,310 @@ def normalize_track_name(track_name):
     Returns:
         str: Normalized track name
     """
-    track_name = track_name.lower()
-    track_name = unicodedata.normalize('NFC', track_name)
-    track_name = track_name.strip()
-    track_name = track_name.translate(str.maketrans('', '', string.punctuation))
-    return track_name
+    track_name = track_name.lower().strip()
+    # Pure ASCII strings are already in NFC form
+    if not track_name.isascii():
+        track_name = unicodedata.normalize('NFC', track_name)
+    return track_name.translate(_PUNCT_TABLE)
+
+
+def encode_rules(rules_df):
+    """
+    Convert a rules DataFrame with song-name itemsets to integer song ids.
+    Used for model files written before ids were stored alongside the rules.
+    
+    Args:
+        rules_df (DataFrame): Rules with antecedents/consequents as frozensets of names
+        
+    Returns:
+        tuple: (encoded_rules_dataframe, id2song_list, song2id_dict)
+    """
+    # Work on plain Python lists rather than through per-row pandas calls
+    antecedents = rules_df['antecedents'].tolist()
+    consequents = rules_df['consequents'].tolist()
+    
+    id2song = sorted(set().union(*antecedents, *consequents))
+    song2id = {song: i for i, song in enumerate(id2song)}
+    
+    rules_df = rules_df.assign(
+        antecedents=[frozenset(map(song2id.__getitem__, itemset)) for itemset in antecedents],
+        consequents=[frozenset(map(song2id.__getitem__, itemset)) for itemset in consequents]
+    )
+    return rules_df, id2song, song2id
+
+
+def itemsets_to_csr(itemsets):
+    """
+    Flatten a sequence of itemsets into CSR-style (offsets, flat) int32 arrays.
+    Items of itemset i are flat[offsets[i]:offsets[i + 1]].
+    
+    Args:
+        itemsets (list): Itemsets (iterables of song ids)
+        
+    Returns:
+        tuple: (offsets_array, flat_array)
+    """
+    # Items sorted by id within each itemset
+    itemsets = [sorted(itemset) for itemset in itemsets]
+    lengths = np.fromiter(map(len, itemsets), dtype=np.int32, count=len(itemsets))
+    offsets = np.zeros(len(itemsets) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = np.fromiter(chain.from_iterable(itemsets), dtype=np.int32, count=int(offsets[-1]))
+    return offsets, flat
+
+
+def gather_csr(offsets, flat, rows):
+    """
+    Concatenate the items of the given CSR rows.
+    
+    Args:
+        offsets (ndarray): CSR offsets array
+        flat (ndarray): CSR flat items array
+        rows (ndarray): Row positions to gather
+        
+    Returns:
+        tuple: (items_array, per_row_lengths_array)
+    """
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    # Position of every gathered item inside flat: row start + rank within row
+    shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return flat[shift + np.arange(len(shift))], lengths
+
+
+def song_bitset(song_ids, n_songs):
+    """
+    Pack a set of song ids into a bitset, one bit per song in uint64 words.
+    Song s is present when (bitset[s >> 6] >> (s & 63)) & 1 is set.
+    
+    Args:
+        song_ids (ndarray): Song ids to include
+        n_songs (int): Size of the song id space
+        
+    Returns:
+        ndarray: uint64 bitset array
+    """
+    bitset = np.zeros((n_songs >> 6) + 1, dtype=np.uint64)
+    bits = np.left_shift(np.uint64(1), (song_ids & 63).astype(np.uint64))
+    np.bitwise_or.at(bitset, song_ids >> 6, bits)
+    return bitset
+
+
+def quantize(values, dtype):
+    """
+    Affine-quantize a metric array onto the full range of an unsigned int dtype:
+    q = round((x - offset) / step), with offset/step from the array's min/max.
+    A constant array gets step 0 and all-zero codes.
+    
+    Args:
+        values (ndarray): Metric values
+        dtype (type): Target unsigned integer dtype (np.uint8, np.uint16)
+        
+    Returns:
+        tuple: (quantized_array, (offset, step))
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.zeros(0, dtype=dtype), (0.0, 1.0)
+    lo, hi = float(values.min()), float(values.max())
+    if hi == lo:
+        return np.zeros(len(values), dtype=dtype), (lo, 0.0)
+    step = (hi - lo) / np.iinfo(dtype).max
+    return np.rint((values - lo) / step).astype(dtype), (lo, step)
+
+
+def _select_rules_numpy(cand, conf, lift, offsets, flat, input_bitset, min_confidence, min_lift):
+    keep = (conf[cand] >= min_confidence) & (lift[cand] >= min_lift)
+    items, lengths = gather_csr(offsets, flat, cand)
+    in_input = (input_bitset[items >> 6] >> (items & 63).astype(np.uint64)) & np.uint64(1)
+    hits = np.bincount(np.repeat(np.arange(len(cand)), lengths),
+                       weights=in_input, minlength=len(cand))
+    return keep & (hits == 0)
+
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True)
+    def _select_rules_jit(cand, conf, lift, offsets, flat, input_bitset, min_confidence, min_lift):
+        # Each candidate is tested independently, so iterations split across threads
+        keep = np.zeros(len(cand), dtype=np.bool_)
+        for i in prange(len(cand)):
+            rule = cand[i]
+            if conf[rule] < min_confidence or lift[rule] < min_lift:
+                continue
+            avoids = True
+            for j in range(offsets[rule], offsets[rule + 1]):
+                song = flat[j]
+                if (input_bitset[song >> 6] >> np.uint64(song & 63)) & np.uint64(1):
+                    avoids = False
+                    break
+            keep[i] = avoids
+        return keep
+
+
+def select_rules(cand, input_bitset, min_confidence, min_lift):
+    """
+    Test which candidate rules pass the confidence/lift thresholds and have
+    no consequent among the input songs. Runs in the compiled _recommend
+    extension or a Numba kernel when available, vectorized NumPy otherwise.
+    
+    Args:
+        cand (ndarray): Candidate rule positions
+        input_bitset (ndarray): uint64 bitset of the input song ids (see song_bitset)
+        min_confidence (float): Minimum confidence threshold for rules
+        min_lift (float): Minimum lift threshold for rules
+        
+    Returns:
+        ndarray: Boolean array, True for the candidates to keep
+    """
+    # float64 thresholds: every path compares the float32 metrics exactly alike
+    args = (cand, app.confidence, app.lift, app.cons_off, app.cons_flat, input_bitset,
+            np.float64(min_confidence), np.float64(min_lift))
+    if HAS_RECOMMEND_EXT:
+        return _select_rules_ext(*args)
+    if HAS_NUMBA:
+        with _numba_lock:
+            return _select_rules_jit(*args)
+    return _select_rules_numpy(*args)
+
+
+def read_feather_model(model_path):
+    """
+    Read a rules model saved in Feather (Arrow IPC) format.
+    The file is memory-mapped: when it holds a single record batch (as
+    save_rules writes it), the rule arrays are zero-copy views into it.
+    
+    Args:
+        model_path (str): Path to the Feather file
+        
+    Returns:
+        dict: Model arrays ('rules', 'id2song', 'song2id', CSR itemsets and metrics)
+    """
+    table = feather.read_table(model_path, memory_map=True)
+    
+    def column(name):
+        # combine_chunks() always copies, so a lone chunk is used as it is
+        chunked = table.column(name)
+        return chunked.chunk(0) if chunked.num_chunks == 1 else chunked.combine_chunks()
+    
+    antecedents = column('antecedents')
+    consequents = column('consequents')
+    id2song = orjson.loads(table.schema.metadata[b'id2song'])
+    
+    return {
+        'rules': table.drop_columns(['antecedents', 'consequents']),
+        'id2song': id2song,
+        'song2id': {song: i for i, song in enumerate(id2song)},
+        'ante_off': antecedents.offsets.to_numpy(),
+        'ante_flat': antecedents.values.to_numpy(),
+        'cons_off': consequents.offsets.to_numpy(),
+        'cons_flat': consequents.values.to_numpy(),
+        'confidence': column('confidence').to_numpy(),
+        'lift': column('lift').to_numpy(),
+        'score': column('score').to_numpy()
+    }
+
+
+def read_pickle_model(model_path):
+    """
+    Read a rules model saved as a pickle file: a dict with the metrics
+    DataFrame, CSR itemsets and vocabulary, or (older files) a dict with an
+    id-encoded rules DataFrame or a bare rules DataFrame of song names.
+    
+    Args:
+        model_path (str): Path to the pickle file
+        
+    Returns:
+        dict: Model arrays ('rules', 'id2song', 'song2id', CSR itemsets and metrics)
+    """
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    
+    if not isinstance(model, dict):
+        rules_df, id2song, song2id = encode_rules(model)
+        model = {'rules': rules_df, 'id2song': id2song, 'song2id': song2id}
+    
+    rules_df = model['rules']
+    if 'ante_flat' not in model:
+        # Model saved before itemsets were stored in CSR form
+        model['ante_off'], model['ante_flat'] = itemsets_to_csr(rules_df['antecedents'].tolist())
+        model['cons_off'], model['cons_flat'] = itemsets_to_csr(rules_df['consequents'].tolist())
+        rules_df = model['rules'] = rules_df.drop(columns=['antecedents', 'consequents'])
+    
+    model['confidence'] = rules_df['confidence'].to_numpy(np.float32)
+    model['lift'] = rules_df['lift'].to_numpy(np.float32)
+    return model
+
+
+def is_feather_file(model_path):
+    """
+    Tell a Feather (Arrow IPC) model file from a pickle by its magic bytes,
+    so the format does not depend on the file name.
+    
+    Args:
+        model_path (str): Path to the rules file
+        
+    Returns:
+        bool: True for a Feather file
+    """
+    with open(model_path, 'rb') as f:
+        magic = f.read(6)
+    return magic == b'ARROW1' or magic[:4] == b'FEA1'
 
 
 def load_model(model_path):
     """
-    Load the association rules model from pickle file.
+    Load the association rules model from a Feather or pickle file (detected
+    by content, whatever the extension).
     
     Args:
-        model_path (str): Path to the pickle file containing rules DataFrame
+        model_path (str): Path to the rules file
         
     Returns:
-        tuple: (rules_dataframe, model_date_string)
+        tuple: (rules_metrics_table, model_date_string)
     """
     try:
-        with open(model_path, 'rb') as f:
-            rules_df = pickle.load(f)
+        if is_feather_file(model_path):
+            model = read_feather_model(model_path)
+        else:
+            model = read_pickle_model(model_path)
+        
+        rules = model['rules']
+        app.id2song = model['id2song']
+        app.song2id = model['song2id']
+        ante_off, ante_flat = model['ante_off'], model['ante_flat']
+        app.cons_off, app.cons_flat = model['cons_off'], model['cons_flat']
+        
+        # Inverted index: song id -> positions of the rules having it as antecedent,
+        # so a request only visits the rules that can actually fire
+        ante_rules = np.repeat(np.arange(len(rules), dtype=np.int32), np.diff(ante_off))
+        order = np.argsort(ante_flat, kind='stable')
+        app.index_rules = ante_rules[order]
+        app.index_off = np.zeros(len(app.id2song) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(ante_flat, minlength=len(app.id2song)), out=app.index_off[1:])
+        
+        # Thresholds are compared against the float32 metrics; the
+        # rule-intrinsic confidence * lift score is only used for ranking, so
+        # it is kept as 16-bit codes
+        conf = app.confidence = np.asarray(model['confidence'], dtype=np.float32)
+        lift = app.lift = np.asarray(model['lift'], dtype=np.float32)
+        score = model['score'] if 'score' in model else conf * lift
+        app.score_q, _ = quantize(score, np.uint16)
+        app.avg_confidence = float(conf.mean(dtype=np.float64)) if len(conf) > 0 else 0
+        app.avg_lift = float(lift.mean(dtype=np.float64)) if len(lift) > 0 else 0
         
         # Get file modification time as model date
         mod_time = os.path.getmtime(model_path)
         model_date = datetime.fromtimestamp(mod_time).isoformat()
         
         print(f"✓ Model loaded from: {model_path}")
-        print(f"  - Rules count: {len(rules_df)}")
+        print(f"  - Rules count: {len(rules)}")
         print(f"  - Model date: {model_date}")
         
-        if len(rules_df) > 0:
-            print(f"  - Avg confidence: {rules_df['confidence'].mean():.4f}")
-            print(f"  - Avg lift: {rules_df['lift'].mean():.4f}")
+        if len(rules) > 0:
+            print(f"  - Avg confidence: {app.avg_confidence:.4f}")
+            print(f"  - Avg lift: {app.avg_lift:.4f}")
         
-        return rules_df, model_date
+        return rules, model_date
     except FileNotFoundError:
         print(f"ERROR: Model file not found at {model_path}")
         raise
@@ -83,13 +425,15 @@ def load_model(model_path):
         raise
 
 
-def get_recommendations(input_songs, rules_df, top_n=10, min_confidence=0.3, min_lift=1.0):
+def get_recommendations(input_songs, top_n=10, min_confidence=0.3, min_lift=1.0):
     """
     Generate song recommendations based on input songs using association rules.
     
+    Uses the lookup arrays precomputed by load_model (app.index_off/app.index_rules,
+    app.confidence, app.lift, app.score_q, app.cons_off/app.cons_flat).
+    
     Args:
         input_songs (list): List of song identifiers (normalized track names)
-        rules_df (DataFrame): DataFrame containing association rules
         top_n (int): Maximum number of recommendations to return
         min_confidence (float): Minimum confidence threshold for rules
         min_lift (float): Minimum lift threshold for rules
@@ -100,39 +444,42 @@ def get_recommendations(input_songs, rules_df, top_n=10, min_confidence=0.3, min
     if not input_songs:
         return []
     
-    if len(rules_df) == 0:
+    if app.index_off is None or len(app.confidence) == 0:
         return []
     
-    # Normalize input songs to match model format
+    # Normalize input songs to match model format, then map them to song ids
+    # (songs unknown to the model can neither trigger nor be recommended)
     normalized_input = {normalize_track_name(song) for song in input_songs}
-    input_set = normalized_input
+    input_set = {app.song2id[song] for song in normalized_input if song in app.song2id}
+    if not input_set:
+        return []
+    input_ids = np.fromiter(input_set, dtype=np.int32, count=len(input_set))
     
-    # Find rules where antecedents are in the input songs
-    # Score recommendations by confidence * lift (can be adjusted)
-    recommendations = {}
+    # Candidate rules: those with at least one antecedent in the input songs
+    cand, _ = gather_csr(app.index_off, app.index_rules, input_ids)
+    cand = np.unique(cand)
     
-    for idx, rule in rules_df.iterrows():
-        antecedents = set(rule['antecedents'])
-        consequents = set(rule['consequents'])
-        
-        # Check if any antecedent is in the input songs
-        # and consequents are not already in input
-        if antecedents.intersection(input_set) and not consequents.intersection(input_set):
-            # Filter by thresholds
-            if rule['confidence'] >= min_confidence and rule['lift'] >= min_lift:
-                # Add consequents to recommendations
-                for song in consequents:
-                    if song not in input_set:
-                        # Score = confidence * lift (higher is better)
-                        score = rule['confidence'] * rule['lift']
-                        
-                        # Keep the best score for each song
-                        if song not in recommendations or score > recommendations[song]:
-                            recommendations[song] = score
-    
-    # Sort by score and return top N
-    sorted_recommendations = sorted(recommendations.items(), key=lambda x: x[1], reverse=True)
-    recommended_songs = [song for song, score in sorted_recommendations[:top_n]]
+    # Keep rules passing the thresholds whose consequents are not already in input
+    input_bitset = song_bitset(input_ids, len(app.id2song))
+    kept = cand[select_rules(cand, input_bitset, min_confidence, min_lift)]
+    if len(kept) == 0:
+        return []
+    
+    # Each consequent carries its rule's score (confidence * lift, higher is
+    # better); keep the best one per song
+    song_ids, lengths = gather_csr(app.cons_off, app.cons_flat, kept)
+    song_scores = np.repeat(app.score_q[kept], lengths)
+    songs, inverse = np.unique(song_ids, return_inverse=True)
+    best_score = np.zeros(len(songs), dtype=np.uint16)
+    np.maximum.at(best_score, inverse, song_scores)
+    
+    # Partial selection of the top N, then sort only those by score
+    if 0 < top_n < len(songs):
+        take = np.argpartition(best_score, -top_n)[-top_n:]
+    else:
+        take = np.arange(len(songs))
+    take = take[np.argsort(-best_score[take].astype(np.int32), kind='stable')]
+    recommended_songs = [app.id2song[song] for song in songs[take[:top_n]].tolist()]
     
     return recommended_songs
 
@@ -184,23 +531,19 @@ def recommend():
                 'error': 'Model not loaded. Server initialization failed.'
             }), 503
         
-        # Generate recommendations (app.model_data is now the rules DataFrame)
+        # Generate recommendations from the precomputed rule index
         recommended_songs = get_recommendations(
-            input_songs, 
-            app.model_data,
+            input_songs,
             top_n=top_n,
             min_confidence=min_confidence,
             min_lift=min_lift
         )
         
-        # Build response
-        response = {
-            'songs': recommended_songs,
-            'version': VERSION,
-            'model_date': app.model_date
-        }
+        # Build response: version and model_date are fixed for the process
+        # lifetime, so only the songs list is serialized per request
+        body = app.response_prefix + orjson.dumps(recommended_songs) + b'}'
         
-        return jsonify(response), 200
+        return app.response_class(body, mimetype='application/json'), 200
         
     except Exception as e:
         return jsonify({
@@ -242,8 +585,8 @@ def stats():
         'version': VERSION,
         'model_date': app.model_date,
         'total_rules': len(app.model_data),
-        'avg_confidence': float(app.model_data['confidence'].mean()) if len(app.model_data) > 0 else 0,
-        'avg_lift': float(app.model_data['lift'].mean()) if len(app.model_data) > 0 else 0,
+        'avg_confidence': app.avg_confidence,
+        'avg_lift': app.avg_lift,
         'port': PORT
     }), 200
 
@@ -262,6 +605,10 @@ def init_app():
         
         # Load the model
         app.model_data, app.model_date = load_model(MODEL_PATH)
+        app.response_prefix = orjson.dumps({
+            'version': VERSION,
+            'model_date': app.model_date
+        })[:-1] + b',"songs":'
         
         print("=" * 80)
         print("✓ SERVER READY")
@@ -276,6 +623,7 @@ def init_app():
         print("Server will start but /api/recommend will return 503 errors")
         app.model_data = None
         app.model_date = None
+        app.index_off = None
 
 
 # Initialize on startup
@@ -284,5 +632,5 @@ init_app()
 
 if __name__ == '__main__':
     # Run the Flask development server
-    # In production, use a WSGI server like gunicorn
+    # In production, use gunicorn: gunicorn -c gunicorn.conf.py server:app
     app.run(host='0.0.0.0', port=PORT, debug=False)
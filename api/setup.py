@@ -0,0 +1,34 @@
+"""
+Build script for the optional compiled rule-selection kernel (_recommend).
+
+Usage:
+    python setup.py build_ext --inplace
+
+The kernel is compiled for the build machine's CPU (-march=native); set
+KERNEL_MARCH (e.g. x86-64-v2) when it runs on different hardware. The
+Dockerfile builds with KERNEL_MARCH=x86-64-v2 by default.
+
+server.py falls back to Numba or NumPy when the extension is not built.
+"""
+
+import os
+from setuptools import setup, Extension
+from Cython.Build import cythonize
+import numpy as np
+
+MARCH = os.environ.get('KERNEL_MARCH', 'native')
+
+extensions = [
+    Extension(
+        '_recommend',
+        ['_recommend.pyx'],
+        include_dirs=[np.get_include()],
+        extra_compile_args=['-O3', f'-march={MARCH}', '-fopenmp'],
+        extra_link_args=['-fopenmp'],
+    )
+]
+
+setup(
+    name='playlist-recommender-kernels',
+    ext_modules=cythonize(extensions),
+)
@@ -1,6 +1,6 @@
 """
 Association Rules Generator for Spotify Playlist Dataset
-Uses Apriori algorithm to mine frequent itemsets and generate association rules.
+Uses FP-Growth (or Apriori) to mine frequent itemsets and generate association rules.
 This code only generates and saves rules - it does NOT make recommendations.
 
 Expected dataset format:
@@ -9,24 +9,61 @@ Expected dataset format:
 """
 
 import pandas as pd
+import numpy as np
+import scipy.sparse
+import os
 import pickle
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
+import json
+import pyarrow as pa
+import pyarrow.feather as feather
+from itertools import chain
+from mlxtend.frequent_patterns import apriori, fpgrowth, association_rules
 import argparse
 from pathlib import Path
 import unicodedata
 import string
+import re
 import sys
 import gc
+from functools import lru_cache, partial
+
+
+# Punctuation removal table, built once instead of on every normalization
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+
+# Same character class as a compiled regex, for removing punctuation from a
+# whole Series in one str.replace pass (faster than str.translate in bulk)
+_PUNCT_RE = re.compile('[' + re.escape(string.punctuation) + ']')
+
+
+@lru_cache(maxsize=50000)
+def normalize_track_name(track_name):
+    """
+    Normalize track name: lowercase, strip, NFC unicode, no punctuation.
+    
+    Args:
+        track_name (str): Original track name
+        
+    Returns:
+        str: Normalized track name
+    """
+    track_name = track_name.lower().strip()
+    # Pure ASCII strings are already in NFC form
+    if not track_name.isascii():
+        track_name = unicodedata.normalize('NFC', track_name)
+    return track_name.translate(_PUNCT_TABLE)
 
 
 class RulesGenerator:
     """
-    Generator for association rules using the Apriori algorithm.
+    Generator for association rules using the FP-Growth or Apriori algorithm.
     Suitable for playlist recommendation systems.
     """
     
-    def __init__(self, min_support=0.01, min_confidence=0.3, min_lift=1.0, max_len=None):
+    ALGORITHMS = ('fpgrowth', 'apriori')
+    
+    def __init__(self, min_support=0.01, min_confidence=0.3, min_lift=1.0, max_len=None,
+                 algorithm='fpgrowth'):
         """
         Initialize the rules generator with threshold parameters.
         
@@ -35,21 +72,39 @@ class RulesGenerator:
             min_confidence (float): Minimum confidence threshold for rules (default: 0.3)
             min_lift (float): Minimum lift threshold for rules (default: 1.0)
             max_len (int): Maximum length of itemsets (None = no limit)
+            algorithm (str): Frequent itemset algorithm, 'fpgrowth' (default) or 'apriori'
         """
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown algorithm '{algorithm}'. Expected one of {self.ALGORITHMS}.")
+        
         self.min_support = min_support
         self.min_confidence = min_confidence
         self.min_lift = min_lift
         self.max_len = max_len
+        self.algorithm = algorithm
         self.frequent_itemsets = None
         self.rules = None
 
     def normalize_track_name(self, track_name):
-        track_name = track_name.lower()
-        track_name = unicodedata.normalize('NFC', track_name)
-        track_name = track_name.strip()
-        track_name = track_name.translate(
-            str.maketrans('', '', string.punctuation))
-        return track_name
+        return normalize_track_name(track_name)
+    
+    def normalize_track_names(self, track_names):
+        """
+        Vectorized equivalent of normalize_track_name for a whole Series.
+        
+        Args:
+            track_names (pd.Series): Original track names
+            
+        Returns:
+            pd.Series: Normalized track names
+        """
+        track_names = track_names.str.lower().str.strip()
+        # Only non-ASCII names can change under NFC normalization
+        non_ascii = ~track_names.map(str.isascii)
+        if non_ascii.any():
+            track_names.loc[non_ascii] = track_names.loc[non_ascii].map(
+                partial(unicodedata.normalize, 'NFC'))
+        return track_names.str.replace(_PUNCT_RE, '', regex=True)
         
     def load_spotify_transactions(self, data_path):
         """
@@ -69,8 +124,8 @@ class RulesGenerator:
         transactions = []
         
         for chunk in pd.read_csv(data_path, chunksize=chunk_size):
-            chunk["track_name"] = chunk["track_name"].apply(self.normalize_track_name)
-            itemsets = chunk.groupby('pid')['track_name'].apply(list).reset_index()
+            chunk["track_name"] = self.normalize_track_names(chunk["track_name"])
+            itemsets = chunk.groupby('pid', sort=False)['track_name'].agg(list).reset_index()
             transactions.extend(itemsets["track_name"].values)
             
             # Free memory
@@ -82,25 +137,31 @@ class RulesGenerator:
 
     def preprocess_transactions(self, transactions):
         """
-        Convert transactions to a one-hot encoded DataFrame suitable for Apriori.
+        Convert transactions to a sparse one-hot encoded DataFrame suitable for itemset mining.
         
         Args:
             transactions (list): List of transactions
             
         Returns:
-            pd.DataFrame: One-hot encoded transaction DataFrame
+            pd.DataFrame: Sparse one-hot encoded transaction DataFrame
         """
         print("Encoding transactions...")
         
-        # Use TransactionEncoder to convert to binary matrix
-        te = TransactionEncoder()
-        te_ary = te.fit(transactions).transform(transactions)
+        # Build the binary matrix directly in CSR form: one row per playlist,
+        # one column per unique song (playlists touch a tiny part of the vocabulary)
+        songs = pd.Categorical(list(chain.from_iterable(transactions)))
+        lengths = np.fromiter(map(len, transactions), dtype=np.int64, count=len(transactions))
+        row_idx = np.repeat(np.arange(len(transactions)), lengths)
+        col_idx = songs.codes
         
-        # Convert to sparse DataFrame to save memory
-        df = pd.DataFrame(te_ary, columns=te.columns_)
+        mat = scipy.sparse.csr_matrix(
+            (np.ones(len(col_idx), dtype=bool), (row_idx, col_idx)),
+            shape=(len(transactions), len(songs.categories))
+        )
+        df = pd.DataFrame.sparse.from_spmatrix(mat, columns=songs.categories)
         
         # Free memory
-        del te_ary
+        del songs, row_idx, col_idx, mat
         gc.collect()
         
         print(f"Encoded {len(df)} transactions with {len(df.columns)} unique items")
@@ -108,7 +169,8 @@ class RulesGenerator:
     
     def generate_frequent_itemsets(self, df_encoded):
         """
-        Generate frequent itemsets using Apriori algorithm.
+        Generate frequent itemsets using the configured algorithm.
+        FP-Growth avoids Apriori's candidate generation and is much faster on playlists.
         
         Args:
             df_encoded (pd.DataFrame): One-hot encoded transaction DataFrame
@@ -116,15 +178,24 @@ class RulesGenerator:
         Returns:
             pd.DataFrame: DataFrame with frequent itemsets and their support
         """
-        print(f"Generating frequent itemsets (min_support={self.min_support}, max_len={self.max_len})...")
-        
-        self.frequent_itemsets = apriori(
-            df_encoded, 
-            min_support=self.min_support, 
-            use_colnames=True,
-            max_len=self.max_len,
-            low_memory=True  # Use less memory
-        )
+        print(f"Generating frequent itemsets (algorithm={self.algorithm}, "
+              f"min_support={self.min_support}, max_len={self.max_len})...")
+        
+        if self.algorithm == 'apriori':
+            self.frequent_itemsets = apriori(
+                df_encoded, 
+                min_support=self.min_support, 
+                use_colnames=True,
+                max_len=self.max_len,
+                low_memory=True  # Use less memory
+            )
+        else:
+            self.frequent_itemsets = fpgrowth(
+                df_encoded,
+                min_support=self.min_support,
+                use_colnames=True,
+                max_len=self.max_len
+            )
         
         print(f"Found {len(self.frequent_itemsets)} frequent itemsets")
         
@@ -174,7 +245,22 @@ class RulesGenerator:
     
     def save_rules(self, output_path):
         """
-        Save the generated rules to a pickle file.
+        Save the generated rules to a Feather (Arrow IPC) file, or to a pickle
+        file when output_path ends with .pkl/.pickle.
+        
+        Songs are stored as dense integer ids and itemsets in CSR form.
+        Confidence and lift are stored as float32 in both formats, so the
+        API applies its thresholds identically whichever one it loads.
+        The Feather file is one uncompressed record batch so the API can
+        memory-map it without copies: 'antecedents'/'consequents' are
+        list<int32> columns (an Arrow list array is exactly an offsets +
+        flat values pair), 'support', 'confidence', 'lift' and 'score'
+        (confidence * lift) columns, and the id -> song name list as JSON
+        under the 'id2song' schema metadata key.
+        The pickle holds a dict with the metrics DataFrame ('rules'), int32
+        'ante_off'/'ante_flat' and 'cons_off'/'cons_flat' arrays (items of
+        rule i are flat[off[i]:off[i + 1]]), plus the 'id2song' list and
+        'song2id' dict mapping ids back and forth.
         
         Args:
             output_path (str): Path to save the rules
@@ -182,8 +268,66 @@ class RulesGenerator:
         if self.rules is None:
             raise ValueError("No rules to save. Generate rules first.")
         
-        with open(output_path, 'wb') as f:
-            pickle.dump(self.rules, f)
+        all_songs = set().union(*self.rules['antecedents'], *self.rules['consequents'])
+        id2song = sorted(all_songs)
+        song2id = {song: i for i, song in enumerate(id2song)}
+        
+        def to_csr(itemsets):
+            # Items sorted by id within each itemset
+            encoded = [sorted(song2id[song] for song in itemset) for itemset in itemsets]
+            lengths = np.fromiter(map(len, encoded), dtype=np.int32, count=len(encoded))
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+            np.cumsum(lengths, out=offsets[1:])
+            flat = np.fromiter(chain.from_iterable(encoded), dtype=np.int32, count=int(offsets[-1]))
+            return offsets, flat
+        
+        ante_off, ante_flat = to_csr(self.rules['antecedents'])
+        cons_off, cons_flat = to_csr(self.rules['consequents'])
+        confidence = self.rules['confidence'].to_numpy(np.float32)
+        lift = self.rules['lift'].to_numpy(np.float32)
+        
+        if Path(output_path).suffix not in ('.pkl', '.pickle'):
+            table = pa.table({
+                'antecedents': pa.ListArray.from_arrays(ante_off, ante_flat),
+                'consequents': pa.ListArray.from_arrays(cons_off, cons_flat),
+                'support': self.rules['support'].to_numpy(),
+                'confidence': confidence,
+                'lift': lift,
+                'score': confidence * lift
+            }).replace_schema_metadata({'id2song': json.dumps(id2song)})
+            
+            def write(f):
+                feather.write_feather(table, f, compression='uncompressed',
+                                      chunksize=max(len(table), 1))
+        else:
+            rules_df = self.rules.drop(columns=['antecedents', 'consequents']).reset_index(drop=True)
+            rules_df['confidence'] = confidence
+            rules_df['lift'] = lift
+            model = {
+                'rules': rules_df,
+                'ante_off': ante_off,
+                'ante_flat': ante_flat,
+                'cons_off': cons_off,
+                'cons_flat': cons_flat,
+                'id2song': id2song,
+                'song2id': song2id
+            }
+            
+            def write(f):
+                pickle.dump(model, f)
+        
+        # Write next to the destination and rename it into place: the API
+        # memory-maps the model, and rewriting the file in place would change
+        # (or truncate) the pages under running pods
+        tmp_path = f"{output_path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
     
     
     def run_pipeline(self, data_path, output_path):
@@ -193,7 +337,7 @@ class RulesGenerator:
         
         Args:
             data_path (str): Path to the Spotify dataset CSV file
-            output_path (str): Path to save the generated rules (pickle file)
+            output_path (str): Path to save the generated rules (Feather or pickle file)
         """
         print("=" * 60)
         print("Starting ML Pipeline - Association Rules Generation")
@@ -235,7 +379,7 @@ def main():
     It does NOT make recommendations - only generates and saves rules.
     """
     parser = argparse.ArgumentParser(
-        description='Generate association rules from Spotify playlist data using Apriori algorithm.\n'
+        description='Generate association rules from Spotify playlist data using FP-Growth or Apriori.\n'
                     'This tool ONLY generates and saves rules - it does NOT make recommendations.',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
@@ -247,9 +391,15 @@ Examples:
   python rulesGenerator.py /home/datasets/spotify/2023_spotify_ds1.csv -s 0.005 -c 0.5 -l 2.0
   
   # Generate rules and save to specific file
-  python rulesGenerator.py /home/datasets/spotify/2023_spotify_ds1.csv -o rules_ds1.pkl
+  python rulesGenerator.py /home/datasets/spotify/2023_spotify_ds1.csv -o rules_ds1.feather
+  
+  # Use the Apriori algorithm instead of FP-Growth
+  python rulesGenerator.py /home/datasets/spotify/2023_spotify_ds1.csv -a apriori
   
   # Update model with ds2
+  python rulesGenerator.py /home/datasets/spotify/2023_spotify_ds2.csv -o rules_ds2.feather
+  
+  # Save as a pickle file instead of Feather (format follows the extension)
   python rulesGenerator.py /home/datasets/spotify/2023_spotify_ds2.csv -o rules_ds2.pkl
         """
     )
@@ -261,8 +411,9 @@ Examples:
     parser.add_argument(
         '-o', '--output', 
         type=str, 
-        default='association_rules.pkl',
-        help='Path to output pickle file (default: association_rules.pkl)'
+        default='association_rules.feather',
+        help='Path to output rules file (default: association_rules.feather). '
+             'A .pkl extension writes a pickle file instead.'
     )
     parser.add_argument(
         '-s', '--min-support', 
@@ -288,6 +439,13 @@ Examples:
         default=None,
         help='Maximum length of itemsets (default: None = no limit). Lower values = faster.'
     )
+    parser.add_argument(
+        '-a', '--algorithm',
+        type=str,
+        choices=RulesGenerator.ALGORITHMS,
+        default='fpgrowth',
+        help='Frequent itemset algorithm (default: fpgrowth). apriori is slower but kept as fallback.'
+    )
     
     args = parser.parse_args()
     
@@ -301,7 +459,8 @@ Examples:
         min_support=args.min_support,
         min_confidence=args.min_confidence,
         min_lift=args.min_lift,
-        max_len=args.max_len
+        max_len=args.max_len,
+        algorithm=args.algorithm
     )
     
     # Run the pipeline
@@ -4,10 +4,53 @@ Analyze CI/CD test results and generate report data.
 Takes JSON output from test_cicd.py and produces analysis and visualizations.
 """
 
-import json
 import argparse
-from datetime import datetime
+from datetime import datetime, timedelta
 import statistics
+import numpy as np
+
+# orjson parses large result files several times faster; fall back to stdlib json
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+def load_results(path):
+    """
+    Load a results file written by test_cicd.py.
+    
+    Accepts the NDJSON stream (test_info header, one line per request and a
+    summary footer) as well as the older single JSON document.
+    
+    Args:
+        path: Path to results file
+        
+    Returns:
+        dict: Results with test_info, summary, changes and detailed_results
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    
+    try:
+        return loads(content)
+    except ValueError:
+        pass
+    
+    lines = content.splitlines()
+    data = loads(lines[-1])
+    if 'summary' not in data:
+        raise ValueError(f"{path} has no summary footer, monitoring did not finish")
+    results = [loads(line) for line in lines[1:-1]]
+    
+    # Request lines store t_ms since the start instead of a timestamp
+    start = parse_timestamp(data['test_info']['start_time'])
+    for r in results:
+        if 't_ms' in r:
+            r['timestamp'] = (start + timedelta(milliseconds=r['t_ms'])).isoformat()
+    
+    data['detailed_results'] = results
+    return data
 
 
 def parse_timestamp(ts_str):
@@ -20,19 +63,25 @@ def analyze_results(json_file):
     Analyze test results from JSON file.
     
     Args:
-        json_file: Path to JSON results file
+        json_file: Path to the results file (NDJSON or legacy JSON)
         
     Returns:
         dict: Analysis results
     """
-    with open(json_file, 'r') as f:
-        data = json.load(f)
+    data = load_results(json_file)
     
     summary = data['summary']
     changes = data['changes']
     results = data['detailed_results']
     test_info = data['test_info']
     
+    # Downtime flag per request, computed once and reused by the analyses below
+    downs = np.fromiter(
+        (r['status'] in ('connection_error', 'timeout') for r in results),
+        dtype=bool,
+        count=len(results)
+    )
+    
     print("=" * 80)
     print(f"CI/CD TEST ANALYSIS: {json_file}")
     print("=" * 80)
@@ -78,17 +127,13 @@ def analyze_results(json_file):
         print(f"    Request #: {change['request_number']}")
         
         # Calculate downtime around this change
-        downtime_before = 0
-        downtime_after = 0
         window = 10  # Check 10 requests before and after
         
         req_idx = change['request_number'] - 1
-        for i in range(max(0, req_idx-window), min(len(results), req_idx+window)):
-            if results[i]['status'] in ['connection_error', 'timeout']:
-                if i < req_idx:
-                    downtime_before += 1
-                else:
-                    downtime_after += 1
+        lo = max(0, req_idx - window)
+        hi = min(len(results), req_idx + window)
+        downtime_before = int(np.count_nonzero(downs[lo:req_idx]))
+        downtime_after = int(np.count_nonzero(downs[req_idx:hi]))
         
         print(f"    Downtime (±{window} requests): {downtime_before} before, {downtime_after} after")
     
@@ -110,37 +155,22 @@ def analyze_results(json_file):
     print(f"DOWNTIME ANALYSIS")
     print(f"{'='*80}")
     
-    downtime_periods = []
-    in_downtime = False
-    downtime_start = None
-    
-    for i, result in enumerate(results):
-        if result['status'] in ['connection_error', 'timeout']:
-            if not in_downtime:
-                in_downtime = True
-                downtime_start = i
-        else:
-            if in_downtime:
-                in_downtime = False
-                period = {
-                    'start_request': downtime_start,
-                    'end_request': i - 1,
-                    'duration_requests': i - downtime_start,
-                    'start_time': results[downtime_start]['timestamp'],
-                    'end_time': results[i-1]['timestamp']
-                }
-                downtime_periods.append(period)
-    
-    # Handle case where downtime extends to end of test
-    if in_downtime:
-        period = {
-            'start_request': downtime_start,
-            'end_request': len(results) - 1,
-            'duration_requests': len(results) - downtime_start,
-            'start_time': results[downtime_start]['timestamp'],
-            'end_time': results[-1]['timestamp']
+    # Downtime periods are runs of consecutive downtime flags: diffing the
+    # zero-padded array gives +1 where a run starts and -1 one past its end
+    edges = np.diff(np.concatenate(([False], downs, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    
+    downtime_periods = [
+        {
+            'start_request': int(start),
+            'end_request': int(end) - 1,
+            'duration_requests': int(end - start),
+            'start_time': results[start]['timestamp'],
+            'end_time': results[end - 1]['timestamp']
         }
-        downtime_periods.append(period)
+        for start, end in zip(starts, ends)
+    ]
     
     if downtime_periods:
         print(f"\nDowntime Periods Detected: {len(downtime_periods)}")
@@ -196,7 +226,7 @@ def generate_text_report(json_files, output_file):
     Generate a text report comparing multiple test results.
     
     Args:
-        json_files: List of JSON result files
+        json_files: List of result files
         output_file: Output text file path
     """
     with open(output_file, 'w') as f:
@@ -209,8 +239,7 @@ def generate_text_report(json_files, output_file):
             f.write(f"Test: {json_file}\n")
             f.write("=" * 80 + "\n\n")
             
-            with open(json_file, 'r') as jf:
-                data = json.load(jf)
+            data = load_results(json_file)
             
             summary = data['summary']
             changes = data['changes']
@@ -233,17 +262,17 @@ def main():
         epilog="""
 Examples:
   # Analyze single test result
-  python analyze_results.py test1_replicas.json
+  python analyze_results.py test1_replicas.ndjson
   
   # Generate comparison report
-  python analyze_results.py test1_replicas.json test2_code.json test3_dataset.json -o report.txt
+  python analyze_results.py test1_replicas.ndjson test2_code.ndjson test3_dataset.ndjson -o report.txt
         """
     )
     
     parser.add_argument(
         'json_files',
         nargs='+',
-        help='JSON result file(s) to analyze'
+        help='Result file(s) to analyze (NDJSON, or legacy JSON)'
     )
     parser.add_argument(
         '-o', '--output',
@@ -9,13 +9,135 @@ Tests ArgoCD redeployment for:
 Measures deployment time and downtime by continuously monitoring the service.
 """
 
-import requests
+import asyncio
+import httpx
 import time
-import json
 import argparse
-from datetime import datetime, timedelta
+from array import array
+import logging
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
+import queue
+import threading
+from datetime import datetime
 import sys
 import os
+import socket
+from itertools import chain
+
+# orjson parses responses and serializes result lines several times faster
+# than stdlib json; both variants work on bytes
+try:
+    from orjson import dumps, loads
+except ImportError:
+    from json import loads
+    import json
+    
+    def dumps(obj):
+        """Serialize obj to JSON bytes."""
+        return json.dumps(obj).encode()
+
+# HTTP/2 needs the h2 package; without it httpx speaks HTTP/1.1 only
+try:
+    import h2
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+try:
+    import asyncio_uring
+    HAS_URING = True
+except ImportError:
+    HAS_URING = False
+
+
+# Outcome buckets returned by make_request, used as counter indexes
+SUCCESS = 0
+DOWNTIME = 1
+ERROR = 2
+REQUESTS = 3  # counter index of the total request count
+
+
+def format_timestamp(timestamp):
+    """Format a time.time() timestamp as a local ISO 8601 string."""
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+class TimedMemoryHandler(MemoryHandler):
+    """MemoryHandler that records when its oldest buffered record is due."""
+    
+    flush_interval = 1.0  # seconds a record may wait in the buffer
+    
+    def shouldFlush(self, record):
+        if len(self.buffer) == 1:
+            self.flush_deadline = time.monotonic() + self.flush_interval
+        return super().shouldFlush(record)
+
+
+class TimedQueueListener(QueueListener):
+    """
+    QueueListener that flushes its TimedMemoryHandlers when their oldest
+    record falls due, even if no further record arrives.
+    """
+    
+    def dequeue(self, block):
+        while True:
+            deadlines = [h.flush_deadline for h in self.handlers if h.buffer]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            try:
+                return self.queue.get(timeout=timeout)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+
+class LocalQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread."""
+    
+    def prepare(self, record):
+        return record
+
+
+def buffered_logger(capacity=64):
+    """
+    Create the per-probe logger of a monitoring run.
+    Records are handed to a listener thread that buffers them and writes
+    them to stdout in batches of capacity, once the oldest is a second old,
+    or right away for warnings, so terminal output never blocks the probe
+    loop.
+    
+    Args:
+        capacity: Number of records to buffer before writing
+    
+    Returns:
+        tuple: (logging.Logger, QueueListener)
+    """
+    records = queue.SimpleQueue()
+    listener = TimedQueueListener(records, TimedMemoryHandler(
+        capacity,
+        flushLevel=logging.WARNING,
+        target=logging.StreamHandler(sys.stdout)
+    ))
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(LocalQueueHandler(records))
+    listener.start()
+    return logger, listener
+
+
+def write_records(path, records):
+    """
+    Write records taken from a queue to path as NDJSON until None arrives.
+    Runs on a background thread so serialization and disk writes stay off
+    the probe loop.
+    
+    Args:
+        path: Output file
+        records: queue.SimpleQueue of dicts
+    """
+    with open(path, 'wb') as out:
+        for record in iter(records.get, None):
+            out.write(dumps(record) + b'\n')
 
 
 class CICDTester:
@@ -36,72 +158,204 @@ class CICDTester:
             "dance monkey"
         ]
         self.request_interval = 2  # seconds between requests
+        self.quiet = False  # only log state transitions, not every probe
+        self.liveness_only = False  # skip parsing the body of most probes
+        self.detail_every = 10  # with liveness_only, parse every Nth probe
+        self._probe_ok = False  # outcome of the last completed probe
+        self._start_mono = time.monotonic()  # t_ms of results counts from here
+        
+        # The probe payload never changes during a run; serialize it once
+        self._probe_url = service_url
+        self._body = dumps({"songs": self.test_songs})
+        self._headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Content-Length': str(len(self._body))
+        }
+        
+        # One pre-shaped dict per outcome; make_request copies the matching
+        # template, which is cheaper than building the dict key by key
+        self._result_templates = {
+            'success': {'status': 'success', 'version': None, 'model_date': None,
+                        'num_recommendations': 0, 'response_time': 0.0, 't_ms': 0},
+            'alive': {'status': 'success', 'version': None, 'model_date': None,
+                      'num_recommendations': None, 'response_time': 0.0, 't_ms': 0},
+            'error': {'status': 'error', 'error_code': 0,
+                      'response_time': 0.0, 't_ms': 0},
+            'timeout': {'status': 'timeout', 'response_time': 0.0, 't_ms': 0},
+            'connection_error': {'status': 'connection_error',
+                                 'response_time': 0.0, 't_ms': 0},
+            'exception': {'status': 'exception', 'error': '',
+                          'response_time': 0.0, 't_ms': 0},
+        }
+        
+    def resolve_service_url(self):
+        """
+        Resolve the service host to an IPv4 address once per run, so new
+        connections (e.g. while pods restart) skip the DNS and IPv6 lookups.
+        Only plain http URLs are rewritten; https needs the hostname for SNI
+        and certificate checks.
+        
+        Returns:
+            tuple: (URL to probe, Host header to send or None)
+        """
+        url = httpx.URL(self.service_url)
+        if url.scheme != 'http':
+            return self.service_url, None
+        
+        try:
+            addrinfo = socket.getaddrinfo(url.host, url.port or 80,
+                                          family=socket.AF_INET, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            return self.service_url, None
+        
+        return str(url.copy_with(host=addrinfo[0][4][0])), url.netloc.decode('ascii')
+    
+    def create_client(self):
+        """
+        Create the HTTP client shared by all probes of a monitoring run.
+        Its pool keeps connections alive between probes and lets several
+        probes be in flight at once. Over HTTP/2 (negotiated on https URLs
+        when h2 is installed) concurrent probes are multiplexed on one
+        connection, so a new probe can succeed while an earlier one is still
+        hanging.
+        
+        Connections have Nagle disabled. The service host is resolved up
+        front (see resolve_service_url); when that yields an IPv4 address,
+        connections are also bound to IPv4.
         
-    def make_request(self):
+        Returns:
+            httpx.AsyncClient: HTTP client
+        """
+        self._probe_url, host = self.resolve_service_url()
+        if host:
+            self._headers['Host'] = host
+        else:
+            self._headers.pop('Host', None)
+        
+        transport = httpx.AsyncHTTPTransport(
+            http2=HAS_H2,
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=8,
+                                keepalive_expiry=60),
+            local_address='0.0.0.0' if host else None,
+            socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+        )
+        return httpx.AsyncClient(transport=transport, timeout=5.0)
+    
+    async def make_request(self, client, parse_body=True):
         """
         Make a single request to the recommendation service.
         
+        Args:
+            client: httpx.AsyncClient to send the request with
+            parse_body: Parse the response for version and model_date; when
+                False a 200 only records liveness (num_recommendations None)
+        
         Returns:
-            dict: Response with status, version, model_date, and response_time
+            tuple: Outcome bucket (SUCCESS, DOWNTIME or ERROR) and a dict
+                with status, version, model_date, response_time and t_ms,
+                the completion time in milliseconds since the run started
         """
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
-            response = requests.post(
-                self.service_url,
-                json={"songs": self.test_songs},
-                timeout=5
+            response = await client.post(
+                self._probe_url,
+                content=self._body,
+                headers=self._headers
             )
-            response_time = time.time() - start_time
+            now = time.monotonic()
+            response_time = now - start_time
             
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    'status': 'success',
-                    'version': data.get('version'),
-                    'model_date': data.get('model_date'),
-                    'num_recommendations': len(data.get('songs', [])),
-                    'response_time': response_time,
-                    'timestamp': datetime.now().isoformat()
-                }
+            if response.status_code == 200 and not parse_body:
+                code = SUCCESS
+                result = self._result_templates['alive'].copy()
+            elif response.status_code == 200:
+                data = loads(response.content)
+                code = SUCCESS
+                result = self._result_templates['success'].copy()
+                # Interned so change detection can compare by identity
+                version = data.get('version')
+                model_date = data.get('model_date')
+                result['version'] = sys.intern(version) if version else None
+                result['model_date'] = sys.intern(model_date) if model_date else None
+                result['num_recommendations'] = len(data.get('songs', []))
             else:
-                return {
-                    'status': 'error',
-                    'error_code': response.status_code,
-                    'response_time': response_time,
-                    'timestamp': datetime.now().isoformat()
-                }
+                code = ERROR
+                result = self._result_templates['error'].copy()
+                result['error_code'] = response.status_code
+            result['response_time'] = response_time
+            result['t_ms'] = int((now - self._start_mono) * 1000)
+            self._probe_ok = code == SUCCESS
+            return code, result
                 
-        except requests.exceptions.Timeout:
-            return {
-                'status': 'timeout',
-                'response_time': time.time() - start_time,
-                'timestamp': datetime.now().isoformat()
-            }
-        except requests.exceptions.ConnectionError:
-            return {
-                'status': 'connection_error',
-                'response_time': time.time() - start_time,
-                'timestamp': datetime.now().isoformat()
-            }
+        except httpx.TimeoutException:
+            code = DOWNTIME
+            result = self._result_templates['timeout'].copy()
+        except (httpx.NetworkError, httpx.RemoteProtocolError):
+            code = DOWNTIME
+            result = self._result_templates['connection_error'].copy()
         except Exception as e:
-            return {
-                'status': 'exception',
-                'error': str(e),
-                'response_time': time.time() - start_time,
-                'timestamp': datetime.now().isoformat()
-            }
+            code = ERROR
+            result = self._result_templates['exception'].copy()
+            result['error'] = str(e)
+        
+        now = time.monotonic()
+        result['response_time'] = now - start_time
+        result['t_ms'] = int((now - self._start_mono) * 1000)
+        self._probe_ok = False
+        return code, result
+    
+    async def schedule_probes(self, client, probes, end_time):
+        """
+        Fire a probe every request_interval seconds until end_time, without
+        waiting for earlier probes to complete. Probe tasks are put on the
+        probes queue in send order, followed by None once scheduling stops.
+        
+        With liveness_only, only every detail_every-th probe, and every probe
+        sent while the service was failing, parses the response body. The
+        first success after a failure therefore always reports the version
+        and model_date.
+        
+        Args:
+            client: httpx.AsyncClient shared by the probes
+            probes: asyncio.Queue receiving the probe tasks
+            end_time: time.monotonic() deadline at which to stop probing
+        """
+        # Sleep until the next tick rather than for a whole interval, so
+        # scheduling delays do not accumulate and probes stay
+        # request_interval apart, as the downtime estimate assumes
+        next_tick = time.monotonic()
+        sent = 0
+        try:
+            while next_tick < end_time:
+                parse_body = (not self.liveness_only or not self._probe_ok
+                              or sent % self.detail_every == 0)
+                probes.put_nowait(asyncio.create_task(self.make_request(client, parse_body)))
+                sent += 1
+                next_tick += self.request_interval
+                await asyncio.sleep(max(0, next_tick - time.monotonic()))
+        finally:
+            probes.put_nowait(None)
     
-    def monitor_continuous(self, duration_minutes=10, output_file=None):
+    async def monitor_continuous(self, duration_minutes=10, output_file=None):
         """
         Continuously monitor the service for changes.
+        Probes run concurrently on a fixed cadence, so a slow request during
+        a rollout does not delay the next probe; results are processed in
+        send order.
+        
+        Results are streamed to output_file as NDJSON while monitoring runs:
+        a test_info header line, one line per request and a footer line
+        with the summary and detected changes. Request lines carry t_ms,
+        milliseconds since test_info.start_time, instead of a timestamp.
         
         Args:
             duration_minutes: How long to monitor (minutes)
-            output_file: File to save monitoring results (JSON)
+            output_file: File to stream monitoring results to (NDJSON)
         
         Returns:
-            list: List of all responses
+            dict: Monitoring summary
         """
         print("=" * 80)
         print(f"Starting continuous monitoring for {duration_minutes} minutes")
@@ -109,82 +363,147 @@ class CICDTester:
         print(f"Request interval: {self.request_interval} seconds")
         print("=" * 80)
         
-        results = []
-        start_time = datetime.now()
-        end_time = start_time + timedelta(minutes=duration_minutes)
+        start_time = time.time()
+        start_mono = self._start_mono = time.monotonic()
+        end_time = start_mono + duration_minutes * 60
+        
+        records = None
+        if output_file:
+            records = queue.SimpleQueue()
+            writer = threading.Thread(target=write_records, args=(output_file, records),
+                                      daemon=True)
+            writer.start()
+            records.put({'test_info': {
+                'service_url': self.service_url,
+                'start_time': format_timestamp(start_time),
+                'request_interval': self.request_interval
+            }})
         
-        request_count = 0
-        success_count = 0
-        error_count = 0
-        downtime_count = 0
+        # Probes per outcome bucket plus the total; an unsigned 64-bit array
+        # is updated in place without allocating new int objects
+        counters = array('Q', [0, 0, 0, 0])
         
         last_version = None
         last_model_date = None
         version_changes = []
         model_changes = []
         
+        probes = asyncio.Queue()
+        producer = None
+        
+        log, log_listener = buffered_logger()
+        last_code = None
+        quiet = self.quiet
+        
         try:
-            while datetime.now() < end_time:
-                request_count += 1
-                result = self.make_request()
-                results.append(result)
+            async with self.create_client() as client:
+                producer = asyncio.create_task(self.schedule_probes(client, probes, end_time))
                 
-                # Track statistics
-                if result['status'] == 'success':
-                    success_count += 1
-                    
-                    # Check for version change
-                    current_version = result.get('version')
-                    if last_version and current_version != last_version:
-                        change_info = {
-                            'timestamp': result['timestamp'],
-                            'old_version': last_version,
-                            'new_version': current_version,
-                            'request_number': request_count
-                        }
-                        version_changes.append(change_info)
-                        print(f"\n🔄 VERSION CHANGE DETECTED!")
-                        print(f"   Old: {last_version} → New: {current_version}")
-                        print(f"   Time: {result['timestamp']}")
-                    last_version = current_version
-                    
-                    # Check for model date change
-                    current_model = result.get('model_date')
-                    if last_model_date and current_model != last_model_date:
-                        change_info = {
-                            'timestamp': result['timestamp'],
-                            'old_model': last_model_date,
-                            'new_model': current_model,
-                            'request_number': request_count
-                        }
-                        model_changes.append(change_info)
-                        print(f"\n🔄 MODEL CHANGE DETECTED!")
-                        print(f"   Old: {last_model_date}")
-                        print(f"   New: {current_model}")
-                        print(f"   Time: {result['timestamp']}")
-                    last_model_date = current_model
+                while True:
+                    probe = await probes.get()
+                    if probe is None:
+                        break
+                    code, result = await probe
                     
-                    # Print status
-                    print(f"[{request_count:04d}] ✓ Success | v{current_version} | "
-                          f"{result['response_time']:.3f}s | "
-                          f"{result['num_recommendations']} recs")
+                    # Track statistics
+                    counters[code] += 1
+                    counters[REQUESTS] += 1
+                    request_count = counters[REQUESTS]
+                    response_time = result['response_time']
                     
-                else:
-                    if result['status'] in ['connection_error', 'timeout']:
-                        downtime_count += 1
-                        print(f"[{request_count:04d}] ✗ DOWNTIME | {result['status']}")
+                    # Outcome transitions are always logged and flushed
+                    # right away; steady-state probes only when not quiet
+                    if code != last_code:
+                        level = logging.WARNING
+                        last_code = code
+                    elif quiet:
+                        level = None
                     else:
-                        error_count += 1
-                        print(f"[{request_count:04d}] ✗ Error | {result['status']}")
+                        level = logging.INFO
+                    
+                    if code == SUCCESS:
+                        num_recommendations = result['num_recommendations']
+                        
+                        if num_recommendations is None:
+                            # Liveness-only probe, nothing to compare
+                            if level is not None:
+                                log.log(level, "[%04d] ✓ Alive | %.3fs",
+                                        request_count, response_time)
+                        
+                        else:
+                            current_version = result['version']
+                            current_model = result['model_date']
+                
+                            # Check for version change
+                            if last_version and current_version is not last_version:
+                                change_info = {
+                                    'timestamp': start_time + result['t_ms'] / 1000,
+                                    'old_version': last_version,
+                                    'new_version': current_version,
+                                    'request_number': request_count
+                                }
+                                version_changes.append(change_info)
+                                log.warning("\n🔄 VERSION CHANGE DETECTED!\n"
+                                            "   Old: %s → New: %s\n"
+                                            "   Time: %s",
+                                            last_version, current_version,
+                                            format_timestamp(change_info['timestamp']))
+                            last_version = current_version
                 
-                # Wait before next request
-                time.sleep(self.request_interval)
+                            # Check for model date change
+                            if last_model_date and current_model is not last_model_date:
+                                change_info = {
+                                    'timestamp': start_time + result['t_ms'] / 1000,
+                                    'old_model': last_model_date,
+                                    'new_model': current_model,
+                                    'request_number': request_count
+                                }
+                                model_changes.append(change_info)
+                                log.warning("\n🔄 MODEL CHANGE DETECTED!\n"
+                                            "   Old: %s\n"
+                                            "   New: %s\n"
+                                            "   Time: %s",
+                                            last_model_date, current_model,
+                                            format_timestamp(change_info['timestamp']))
+                            last_model_date = current_model
                 
-        except KeyboardInterrupt:
-            print("\n\nMonitoring interrupted by user")
+                            # Log status
+                            if level is not None:
+                                log.log(level, "[%04d] ✓ Success | v%s | %.3fs | %d recs",
+                                        request_count, current_version,
+                                        response_time, num_recommendations)
+                
+                    elif level is not None:
+                        if code == DOWNTIME:
+                            log.log(level, "[%04d] ✗ DOWNTIME | %s",
+                                    request_count, result['status'])
+                        else:
+                            log.log(level, "[%04d] ✗ Error | %s",
+                                    request_count, result['status'])
+                    
+                    if records is not None:
+                        records.put(result)
+            
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            log.warning("\n\nMonitoring interrupted by user")
+            if producer is not None:
+                producer.cancel()
+            while not probes.empty():
+                probe = probes.get_nowait()
+                if probe is not None:
+                    probe.cancel()
+        
+        log_listener.stop()
+        for handler in log.handlers + list(log_listener.handlers):
+            handler.close()
+        log.handlers.clear()
         
         # Calculate statistics
-        total_time = (datetime.now() - start_time).total_seconds()
+        total_time = time.monotonic() - start_mono
+        success_count = counters[SUCCESS]
+        downtime_count = counters[DOWNTIME]
+        error_count = counters[ERROR]
+        request_count = counters[REQUESTS]
         
         print("\n" + "=" * 80)
         print("MONITORING SUMMARY")
@@ -203,44 +522,47 @@ class CICDTester:
         
         print(f"\nVersion changes detected: {len(version_changes)}")
         for change in version_changes:
-            print(f"  - {change['old_version']} → {change['new_version']} at {change['timestamp']}")
+            print(f"  - {change['old_version']} → {change['new_version']} at {format_timestamp(change['timestamp'])}")
         
         print(f"\nModel changes detected: {len(model_changes)}")
         for change in model_changes:
-            print(f"  - {change['old_model'][:19]} → {change['new_model'][:19]} at {change['timestamp']}")
+            print(f"  - {change['old_model'][:19]} → {change['new_model'][:19]} at {format_timestamp(change['timestamp'])}")
         
-        # Save results to file
-        if output_file:
-            report = {
+        summary = {
+            'total_requests': request_count,
+            'successful': success_count,
+            'errors': error_count,
+            'downtime_count': downtime_count,
+            'downtime_seconds': downtime_count * self.request_interval,
+            'success_rate': success_count/request_count if request_count > 0 else 0
+        }
+        
+        # Finish the results stream with the summary footer
+        if records is not None:
+            for change in chain(version_changes, model_changes):
+                change['timestamp'] = format_timestamp(change['timestamp'])
+            
+            records.put({
                 'test_info': {
                     'service_url': self.service_url,
-                    'start_time': start_time.isoformat(),
-                    'end_time': datetime.now().isoformat(),
+                    'start_time': format_timestamp(start_time),
+                    'end_time': format_timestamp(start_time + total_time),
                     'duration_seconds': total_time,
                     'request_interval': self.request_interval
                 },
-                'summary': {
-                    'total_requests': request_count,
-                    'successful': success_count,
-                    'errors': error_count,
-                    'downtime_count': downtime_count,
-                    'downtime_seconds': downtime_count * self.request_interval,
-                    'success_rate': success_count/request_count if request_count > 0 else 0
-                },
+                'summary': summary,
                 'changes': {
                     'version_changes': version_changes,
                     'model_changes': model_changes
-                },
-                'detailed_results': results
-            }
-            
-            with open(output_file, 'w') as f:
-                json.dump(report, f, indent=2)
+                }
+            })
+            records.put(None)
+            writer.join()
             print(f"\n✓ Results saved to: {output_file}")
         
         print("=" * 80)
         
-        return results
+        return summary
 
 
 def main():
@@ -253,7 +575,10 @@ Examples:
   python test_cicd.py http://localhost:50013/api/recommend
   
   # Monitor for 30 minutes and save results
-  python test_cicd.py http://localhost:50013/api/recommend -d 30 -o results.json
+  python test_cicd.py http://localhost:50013/api/recommend -d 30 -o results.ndjson
+  
+  # Sub-second probing on an io_uring event loop
+  python test_cicd.py http://localhost:50013/api/recommend -i 0.05 --uring
   
   # Use with port forwarding to k8s service
   kubectl port-forward svc/playlist-recommender-svc 50013:50013 -n giovanamachado
@@ -275,7 +600,7 @@ Examples:
     parser.add_argument(
         '-o', '--output',
         type=str,
-        help='Output file to save results (JSON format)'
+        help='Output file to stream results to (NDJSON format)'
     )
     parser.add_argument(
         '-i', '--interval',
@@ -283,18 +608,44 @@ Examples:
         default=2.0,
         help='Interval between requests in seconds (default: 2.0)'
     )
+    parser.add_argument(
+        '-q', '--quiet',
+        action='store_true',
+        help='Only log outcome, version and model transitions instead of every request'
+    )
+    parser.add_argument(
+        '--liveness-only',
+        action='store_true',
+        help='Only check for a 200 on most requests; parse the response of every '
+             '10th request and after failures to detect version and model changes'
+    )
+    parser.add_argument(
+        '--uring',
+        action='store_true',
+        help='Run the probes on an io_uring event loop (Linux, needs asyncio-uring)'
+    )
     
     args = parser.parse_args()
     
+    # Optionally replace the epoll selector loop with io_uring
+    if args.uring:
+        if HAS_URING and sys.platform.startswith('linux'):
+            asyncio.set_event_loop_policy(asyncio_uring.EventLoopPolicy())
+        else:
+            print("Warning: io_uring event loop not available, using the default loop.")
+            print("Install with: pip install asyncio-uring")
+    
     # Create tester
     tester = CICDTester(args.service_url)
     tester.request_interval = args.interval
+    tester.quiet = args.quiet
+    tester.liveness_only = args.liveness_only
     
     # Run monitoring
-    tester.monitor_continuous(
+    asyncio.run(tester.monitor_continuous(
         duration_minutes=args.duration,
         output_file=args.output
-    )
+    ))
 
 
 if __name__ == '__main__':
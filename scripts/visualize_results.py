@@ -4,11 +4,13 @@ Generate visualizations from CI/CD test results.
 Creates charts and graphs for the PDF report.
 """
 
-import json
 import argparse
+import os
 from datetime import datetime
 import sys
 
+from analyze_results import load_results
+
 # Try to import matplotlib, but make it optional
 try:
     import matplotlib.pyplot as plt
@@ -31,15 +33,14 @@ def plot_timeline(json_file, output_file):
     Create a timeline visualization showing request success/failure over time.
     
     Args:
-        json_file: Path to JSON results file
+        json_file: Path to the results file (NDJSON or legacy JSON)
         output_file: Path to save the plot image
     """
     if not HAS_MATPLOTLIB:
         print("Matplotlib not available. Skipping timeline plot.")
         return
     
-    with open(json_file, 'r') as f:
-        data = json.load(f)
+    data = load_results(json_file)
     
     results = data['detailed_results']
     
@@ -99,15 +100,14 @@ def plot_response_times(json_file, output_file):
     Create a plot showing response times over time.
     
     Args:
-        json_file: Path to JSON results file
+        json_file: Path to the results file (NDJSON or legacy JSON)
         output_file: Path to save the plot image
     """
     if not HAS_MATPLOTLIB:
         print("Matplotlib not available. Skipping response time plot.")
         return
     
-    with open(json_file, 'r') as f:
-        data = json.load(f)
+    data = load_results(json_file)
     
     results = data['detailed_results']
     
@@ -153,7 +153,7 @@ def plot_comparison_bar(json_files, output_file):
     Create a bar chart comparing metrics across multiple tests.
     
     Args:
-        json_files: List of JSON result files
+        json_files: List of result files
         output_file: Path to save the plot image
     """
     if not HAS_MATPLOTLIB:
@@ -166,8 +166,7 @@ def plot_comparison_bar(json_files, output_file):
     success_rates = []
     
     for json_file in json_files:
-        with open(json_file, 'r') as f:
-            data = json.load(f)
+        data = load_results(json_file)
         
         # Extract test name
         if 'replicas' in json_file:
@@ -237,20 +236,20 @@ def main():
         epilog="""
 Examples:
   # Generate timeline for single test
-  python visualize_results.py test1_replicas.json --timeline timeline1.png
+  python visualize_results.py test1_replicas.ndjson --timeline timeline1.png
   
   # Generate comparison chart for all tests
-  python visualize_results.py test1_replicas.json test2_code.json test3_dataset.json --comparison comparison.png
+  python visualize_results.py test1_replicas.ndjson test2_code.ndjson test3_dataset.ndjson --comparison comparison.png
   
   # Generate all visualizations
-  python visualize_results.py test1_replicas.json --all
+  python visualize_results.py test1_replicas.ndjson --all
         """
     )
     
     parser.add_argument(
         'json_files',
         nargs='+',
-        help='JSON result file(s) to visualize'
+        help='Result file(s) to visualize (NDJSON, or legacy JSON)'
     )
     parser.add_argument(
         '--timeline',
@@ -265,7 +264,7 @@ Examples:
     parser.add_argument(
         '--comparison',
         type=str,
-        help='Generate comparison plot (requires multiple JSON files)'
+        help='Generate comparison plot (requires multiple result files)'
     )
     parser.add_argument(
         '--all',
@@ -284,7 +283,7 @@ Examples:
     if args.all:
         # Generate timeline and response time for first file
         if len(args.json_files) >= 1:
-            base_name = args.json_files[0].replace('.json', '')
+            base_name = os.path.splitext(args.json_files[0])[0]
             plot_timeline(args.json_files[0], f'{base_name}_timeline.png')
             plot_response_times(args.json_files[0], f'{base_name}_response.png')
         